@@ -0,0 +1,131 @@
+import ifcopenshell
+import ifcopenshell.guid
+import ifcopenshell.util.system
+import sys
+
+from system_graph import SystemGraph
+
+# ifcopenshell.util.system call per element for each SystemGraph.trace direction
+UTIL_TRACES = {
+    'downstream': lambda element: ifcopenshell.util.system.get_connected_to(element),
+    'upstream': lambda element: ifcopenshell.util.system.get_connected_from(element),
+    'both': lambda element: (ifcopenshell.util.system.get_connected_to(element)
+        + ifcopenshell.util.system.get_connected_from(element)),
+}
+
+
+def util_reachable(starts, direction: str = 'downstream') -> set:
+    """Elements reached from `starts`, one ifcopenshell.util.system call per element"""
+    connected = UTIL_TRACES[direction]
+    visited = set(starts)
+    queue = list(starts)
+    while queue:
+        for element in connected(queue.pop()):
+            if element not in visited:
+                visited.add(element)
+                queue.append(element)
+    return visited
+
+
+def compare_with_util(model, elements, trace_starts=None) -> list:
+    """
+    Describe every difference between SystemGraph & ifcopenshell.util.system.
+    System membership is compared for `elements`, traces in every direction from each of `trace_starts`
+    (every element when omitted)
+    """
+    graph = SystemGraph(model)
+    differences = []
+    for element in elements:
+        expected = sorted(system.id() for system in ifcopenshell.util.system.get_element_systems(element))
+        actual = sorted(system.id() for system in graph.get_element_systems(element))
+        if actual != expected:
+            differences.append('systems of #{}: graph {}, util {}'.format(element.id(), actual, expected))
+
+    for start in elements if trace_starts is None else trace_starts:
+        starts = start if isinstance(start, list) else [start]
+        for direction in UTIL_TRACES:
+            expected = sorted(element.id() for element in util_reachable(starts, direction))
+            actual = sorted(element.id() for element in graph.trace(starts, direction=direction))
+            if actual != expected:
+                differences.append('{} trace from {}: graph {}, util {}'.format(
+                    direction, [element.id() for element in starts], actual, expected))
+    return differences
+
+
+def _create(model, ifc_class, **attributes):
+    return model.create_entity(ifc_class, GlobalId=ifcopenshell.guid.new(), **attributes)
+
+
+def _connect(model, relating_port, related_port) -> None:
+    _create(model, 'IfcRelConnectsPorts', RelatingPort=relating_port, RelatedPort=related_port)
+
+
+def _assign(model, group, elements) -> None:
+    _create(model, 'IfcRelAssignsToGroup', RelatingGroup=group, RelatedObjects=elements)
+
+
+def create_ifc4_cases():
+    """
+    IFC4 model with one element per edge case:
+    a -> b SOURCE to SINK, b -> c with the Relating/Related order against the flow directions,
+    c -> d SINK to SINK, d -> e NOTDEFINED, plus member-only, unnamed system & zone assignments
+    """
+    model = ifcopenshell.file(schema='IFC4')
+    elements = {name: _create(model, 'IfcPipeSegment', Name=name) for name in 'abcde'}
+    elements['member'] = _create(model, 'IfcPipeSegment', Name='member')
+
+    def ports(element, *directions):
+        result = [_create(model, 'IfcDistributionPort', FlowDirection=direction) for direction in directions]
+        _create(model, 'IfcRelNests', RelatingObject=element, RelatedObjects=result)
+        return result
+
+    a_out, = ports(elements['a'], 'SOURCE')
+    b_in, b_out = ports(elements['b'], 'SINK', 'SOURCE')
+    c_in, c_out = ports(elements['c'], 'SOURCE', 'SINK')
+    d_in, d_out = ports(elements['d'], 'SINK', 'NOTDEFINED')
+    e_in, = ports(elements['e'], 'NOTDEFINED')
+    _connect(model, a_out, b_in)
+    _connect(model, c_in, b_out)  # reversed pair
+    _connect(model, c_out, d_in)  # SINK - SINK
+    _connect(model, d_out, e_in)  # NOTDEFINED - NOTDEFINED
+
+    named = _create(model, 'IfcDistributionSystem', Name='Chilled Water', PredefinedType='CHILLEDWATER')
+    unnamed = _create(model, 'IfcDistributionSystem', PredefinedType='DOMESTICCOLDWATER')
+    zone = _create(model, 'IfcZone', Name='Zone')
+    _assign(model, named, [elements['a'], elements['b'], elements['member']])
+    _assign(model, unnamed, [elements['c'], elements['member']])
+    _assign(model, zone, [elements['d']])
+    return model, list(elements.values())
+
+
+def create_ifc2x3_cases():
+    """IFC2X3 model, ports attached through IfcRelConnectsPortToElement & an unnamed IfcSystem"""
+    model = ifcopenshell.file(schema='IFC2X3')
+    elements = [_create(model, 'IfcFlowSegment', Name=name) for name in 'abc']
+
+    def port(element, direction):
+        result = _create(model, 'IfcDistributionPort', FlowDirection=direction)
+        _create(model, 'IfcRelConnectsPortToElement', RelatingPort=result, RelatedElement=element)
+        return result
+
+    _connect(model, port(elements[0], 'SOURCE'), port(elements[1], 'SINK'))
+    _connect(model, port(elements[2], 'SINK'), port(elements[1], 'SOURCE'))
+    _assign(model, _create(model, 'IfcSystem'), elements[:2])
+    return model, elements
+
+
+if __name__ == '__main__':
+    failed = False
+    for name, (model, elements) in (('IFC4', create_ifc4_cases()), ('IFC2X3', create_ifc2x3_cases())):
+        differences = compare_with_util(model, elements)
+        for difference in differences:
+            print('[-] {}: {}'.format(name, difference))
+        if not differences:
+            print('[+] {}: SystemGraph matches ifcopenshell.util.system'.format(name))
+        failed = failed or bool(differences)
+
+    empty = ifcopenshell.file(schema='IFC4')
+    if SystemGraph(empty).connected_components() != []:
+        print('[-] Empty model: connected_components should be empty')
+        failed = True
+    sys.exit(1 if failed else 0)
@@ -7,6 +7,7 @@ import ifcopenshell.util.system
 import os
 
 from enum import Enum
+from system_graph import SystemGraph
 
 
 class IfcElementTypeEnum(Enum):
@@ -98,9 +99,8 @@ def print_type_of_element(ifc_model, instance_description: str) -> None:
 
 def print_properties_of_element(ifc_model, instance_description: str) -> None:
     """Get and print the properties & quantities of an entity type"""
-    element = model.by_type(instance_description)[0]
+    element = ifc_model.by_type(instance_description)[0]
     element_type = ifcopenshell.util.element.get_type(element)
-    import pdb; pdb.set_trace()
     # Get all properties and quantities as a dictionary
     psets = ifcopenshell.util.element.get_psets(element_type)
     print(psets)
@@ -122,7 +122,7 @@ def find_spatial_container_of_element(ifc_model, instance_description: str) -> N
     Walls are typically located on a storey i.e. Level 1
     Equipment might be located in spaces, etc
     """
-    element = model.by_type(instance_description)[0]
+    element = ifc_model.by_type(instance_description)[0]
     container = ifcopenshell.util.element.get_container(element)
     print("The element {} is located on {}".format(element.Name, container.Name))
 
@@ -171,20 +171,26 @@ def print_element_classification(ifc_model, instance_description: str) -> None:
         print("This reference is part of the system", system.Name)
 
 
+def get_pipe_segments(ifc_model) -> list:
+    """IfcPipeSegment instances, empty for schemas without the class (IFC2X3 uses IfcFlowSegment)"""
+    try:
+        return ifc_model.by_type(IfcElementEnum.PIPE.value)
+    except RuntimeError:
+        return []
+
+
 def print_element_distribution_system(ifc_model) -> None:
     """
     Get the distribution system of an element
     Elements may be assigned to multiple systems simultaneously i.e. electrical, hydraulic;
     """
-    try:
-        pipe = ifc_model.by_type("IfcPipeSegment")[0]
-    except:
+    pipes = get_pipe_segments(ifc_model)
+    if not pipes:
         print("[-] Model does not contain any 'IfcPipeSegment' instances")
         return
-    
-    try:
-        systems = ifcopenshell.util.system.get_element_systems(pipe)
-    except:
+
+    systems = ifcopenshell.util.system.get_element_systems(pipes[0])
+    if not systems:
         print("[-] Pipe instance is not assigned to any system")
         return
 
@@ -193,6 +199,30 @@ def print_element_distribution_system(ifc_model) -> None:
         print("This pipe is part of the system", system.Name)
 
 
+def print_all_distribution_systems(ifc_model) -> None:
+    """
+    Print the systems of every pipe segment & the size of each connected network.
+    SystemGraph reads all ports, port connections & system assignments once,
+    instead of calling ifcopenshell.util.system for each element
+    """
+    pipes = get_pipe_segments(ifc_model)
+    if not pipes:
+        print("[-] Model does not contain any 'IfcPipeSegment' instances")
+        return
+
+    graph = SystemGraph(ifc_model)
+    for pipe in pipes:
+        systems = graph.get_element_systems(pipe)
+        # Name is optional on every IfcRoot, systems included
+        names = ", ".join(system.Name or "<unnamed>" for system in systems)
+        print("{} is part of: {}".format(pipe.Name, names or "no system"))
+
+    for component in graph.connected_components():
+        # Elements assigned to a system without any ports form a network of their own
+        if len(component) > 1:
+            print("Network containing {} connects {} elements".format(component[0].Name, len(component)))
+
+
 def create_copy_of_element(ifc_file, element_to_copy, mode):
     """
     Copy an entity instance
@@ -201,9 +231,9 @@ def create_copy_of_element(ifc_file, element_to_copy, mode):
     if mode.lower() == 'high level':
         return ifcopenshell.api.root.copy_class(ifc_file, product=element_to_copy)
     elif mode.lower() == 'shallow':
-        return ifcopenshell.util.element.copy(model, element_to_copy)
+        return ifcopenshell.util.element.copy(ifc_file, element_to_copy)
     elif mode.lower() == 'deepgraph':
-        return ifcopenshell.util.element.copy_deep(model, element_to_copy, exclude=None)
+        return ifcopenshell.util.element.copy_deep(ifc_file, element_to_copy, exclude=None)
     else:
         print('Unknown mode attribute. Expected: "high level", "shallow" or "deepgraph"')
         return
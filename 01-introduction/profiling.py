@@ -0,0 +1,258 @@
+import functools
+import importlib
+import json
+import math
+import platform
+import threading
+import time
+import tracemalloc
+
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError: # not available on Windows
+    resource = None
+
+
+# Hot-path operations used throughout misc.py, selector_syntax.py & create_geometry.py
+# Each entry is (module, attribute path inside the module, operation name in the trace)
+HOT_PATHS = [
+    ('ifcopenshell', 'open', 'open'),
+    ('ifcopenshell', 'file.by_type', 'by_type'),
+    ('ifcopenshell', 'file.create_entity', 'file.create_entity'),
+    ('ifcopenshell', 'file.write', 'write'),
+    ('ifcopenshell.util.element', 'get_psets', 'get_psets'),
+    ('ifcopenshell.util.element', 'get_container', 'get_container'),
+    ('ifcopenshell.util.placement', 'get_local_placement', 'get_local_placement'),
+    ('ifcopenshell.util.selector', 'filter_elements', 'filter_elements'),
+    ('ifcopenshell.api.root', 'create_entity', 'create_entity'),
+]
+
+
+# tracemalloc only sees the Python heap, ifcopenshell's C++ model data shows up in the RSS growth
+MEMORY_NOTE = ('peak_python_kib is the Python heap peak seen by tracemalloc and excludes native (C++) memory; '
+    'rss_growth_kib is the growth of the process resident set across the call, which includes it')
+
+
+def _max_rss_kib() -> int:
+    """Process high-water mark of resident memory in KiB (0 where unsupported)"""
+    if resource is None:
+        return 0
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports kilobytes
+    return max_rss // 1024 if platform.system() == 'Darwin' else max_rss
+
+
+def _rss_kib() -> int:
+    """Current resident memory in KiB, falls back to the high-water mark where /proc is missing"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() // 1024
+    except (OSError, AttributeError):
+        return _max_rss_kib()
+
+
+def percentile(ordered: list, p: float) -> float:
+    """Nearest-rank percentile of already sorted samples"""
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def trace_meta() -> dict:
+    """Environment the trace was recorded in"""
+    import ifcopenshell
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'ifcopenshell': getattr(ifcopenshell, 'version', 'unknown'),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'memory': MEMORY_NOTE,
+    }
+
+
+def write_stacks(stacks: dict, path: str) -> None:
+    """
+    Write a collapsed stack dump, one `op;nested_op microseconds` line per stack.
+    Values are self time, e.g. render with: flamegraph.pl trace.folded > trace.svg
+    """
+    lines = ['{} {}'.format(key, int(self_time * 1e6)) for key, self_time in sorted(stacks.items())]
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+class _Frame:
+    """Bookkeeping for one in-progress operation on the current thread"""
+    __slots__ = ('name', 'start', 'child_time', 'start_traced', 'peak_traced', 'start_rss')
+
+    def __init__(self, name, start, start_traced, start_rss):
+        self.name = name
+        self.start = start
+        self.child_time = 0.0
+        self.start_traced = start_traced
+        self.peak_traced = start_traced
+        self.start_rss = start_rss
+
+
+class Profiler:
+    """
+    Records wall time, call counts & peak memory per operation.
+    Nested operations are tracked per thread, so the collected stacks
+    can be dumped in the collapsed format read by flamegraph.pl / speedscope.
+
+    Memory tracing slows allocation-heavy Python code down several times,
+    time with `trace_memory=False` and measure memory in a separate pass.
+    See MEMORY_NOTE for what the memory fields include.
+
+    Usage:
+        profiler = Profiler()
+        with profiler.instrumented():
+            misc.print_properties_of_element(model, 'IfcWall')
+        profiler.write_trace('trace.json')
+        profiler.write_stacks('trace.folded')
+    """
+
+    def __init__(self, trace_memory: bool = True):
+        self.trace_memory = trace_memory
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._patched = []
+        self._started_tracing = False
+        self.reset()
+
+    def reset(self) -> None:
+        """Discard everything recorded so far"""
+        with self._lock:
+            self.operations = {}
+            self.stacks = {}
+
+    def _stack(self) -> list:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def profile(self, name: str):
+        """Record a single call of the operation `name`"""
+        stack = self._stack()
+        # Recursive helpers (e.g. get_local_placement walking PlacementRelTo)
+        # are measured once at the outermost call
+        if stack and stack[-1].name == name:
+            yield
+            return
+
+        traced = rss = 0
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            traced, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].peak_traced = max(stack[-1].peak_traced, peak)
+            tracemalloc.reset_peak()
+            rss = _rss_kib()
+
+        frame = _Frame(name, time.perf_counter(), traced, rss)
+        stack.append(frame)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - frame.start
+            stack.pop()
+            rss_growth_kib = 0
+            if self.trace_memory:
+                frame.peak_traced = max(frame.peak_traced, tracemalloc.get_traced_memory()[1])
+                rss_growth_kib = max(0, _rss_kib() - frame.start_rss)
+            peak_kib = (frame.peak_traced - frame.start_traced) // 1024
+            if stack:
+                stack[-1].child_time += elapsed
+                stack[-1].peak_traced = max(stack[-1].peak_traced, frame.peak_traced)
+            stack_key = ';'.join([f.name for f in stack] + [name])
+            self._record(name, elapsed, elapsed - frame.child_time, peak_kib, rss_growth_kib, stack_key)
+
+    def _record(self, name, elapsed, self_time, peak_kib, rss_growth_kib, stack_key) -> None:
+        with self._lock:
+            op = self.operations.get(name)
+            if op is None:
+                op = self.operations[name] = {
+                    'calls': 0, 'total_s': 0.0, 'min_s': elapsed, 'max_s': elapsed,
+                    'peak_python_kib': 0, 'rss_growth_kib': 0,
+                }
+            op['calls'] += 1
+            op['total_s'] += elapsed
+            op['min_s'] = min(op['min_s'], elapsed)
+            op['max_s'] = max(op['max_s'], elapsed)
+            op['peak_python_kib'] = max(op['peak_python_kib'], peak_kib)
+            op['rss_growth_kib'] = max(op['rss_growth_kib'], rss_growth_kib)
+            self.stacks[stack_key] = self.stacks.get(stack_key, 0.0) + self_time
+
+    def profiled(self, name: str):
+        """Decorator form of `profile`"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.profile(name):
+                    return func(*args, **kwargs)
+            wrapper.__profiled__ = func
+            return wrapper
+        return decorator
+
+    def instrument(self, hot_paths=None) -> None:
+        """Wrap the ifcopenshell hot paths so every call is recorded"""
+        if self._patched:
+            return
+        for module_name, attr_path, name in (HOT_PATHS if hot_paths is None else hot_paths):
+            owner = importlib.import_module(module_name)
+            *parents, attr = attr_path.split('.')
+            for parent in parents:
+                owner = getattr(owner, parent)
+            original = getattr(owner, attr)
+            setattr(owner, attr, self.profiled(name)(original))
+            self._patched.append((owner, attr, original))
+
+    def uninstrument(self) -> None:
+        """Restore the original ifcopenshell functions & stop tracemalloc if this profiler started it"""
+        while self._patched:
+            owner, attr, original = self._patched.pop()
+            setattr(owner, attr, original)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextmanager
+    def instrumented(self, hot_paths=None):
+        self.instrument(hot_paths)
+        try:
+            yield self
+        finally:
+            self.uninstrument()
+
+    def summary(self) -> dict:
+        """Aggregated statistics per operation"""
+        with self._lock:
+            operations = {}
+            for name, op in sorted(self.operations.items()):
+                operations[name] = dict(op, mean_s=op['total_s'] / op['calls'])
+            return operations
+
+    def to_dict(self) -> dict:
+        return {'meta': trace_meta(), 'operations': self.summary()}
+
+    def write_trace(self, path: str) -> None:
+        """Write the structured JSON trace"""
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def write_stacks(self, path: str) -> None:
+        """Write the collapsed stack dump of this profiler, see `write_stacks`"""
+        with self._lock:
+            stacks = dict(self.stacks)
+        write_stacks(stacks, path)
+
+    def print_summary(self) -> None:
+        print('{:<22}{:>8}{:>12}{:>12}{:>14}'.format('operation', 'calls', 'total s', 'mean ms', 'peak py KiB'))
+        for name, op in self.summary().items():
+            print('{:<22}{:>8}{:>12.4f}{:>12.3f}{:>14}'.format(
+                name, op['calls'], op['total_s'], op['mean_s'] * 1000, op['peak_python_kib']))
@@ -0,0 +1,436 @@
+import argparse
+import asyncio
+import ifcopenshell
+import ifcopenshell.util.classification
+import ifcopenshell.util.element
+import ifcopenshell.util.placement
+import ifcopenshell.util.selector
+import ifcopenshell.util.system
+import json
+import os
+import statistics
+import threading
+import time
+
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from profiling import percentile
+from system_graph import SystemGraph
+from urllib.parse import parse_qs, urlsplit
+
+# Latency samples kept per endpoint for the percentiles reported by /stats
+LATENCY_SAMPLES = 10000
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+class QueryError(Exception):
+    """A request the server cannot answer, reported to the client with `status`"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class WarmModel:
+    """A parsed model kept in memory between requests"""
+
+    def __init__(self, path: str, mtime: float, model):
+        self.path = path
+        self.mtime = mtime
+        self.model = model
+        self._graph = None
+        self._graph_lock = threading.Lock()
+
+    @property
+    def graph(self) -> SystemGraph:
+        """Distribution system graph, built by the first query that needs it"""
+        with self._graph_lock:
+            if self._graph is None:
+                self._graph = SystemGraph(self.model)
+            return self._graph
+
+
+class ModelCache:
+    """
+    Bounded LRU set of parsed models, keyed by path relative to `root`.
+    A model is reopened when its file changes on disk.
+    Concurrent requests for a model that is still loading share a single ifcopenshell.open.
+    """
+
+    def __init__(self, root: str, max_models: int, executor):
+        self.root = os.path.realpath(root)
+        self.max_models = max_models
+        self.executor = executor
+        self._models = OrderedDict()
+        self._loading = {}
+
+    def resolve(self, name: str) -> str:
+        if not name:
+            raise QueryError("Missing 'model' parameter")
+        path = os.path.realpath(os.path.join(self.root, name))
+        if os.path.commonpath([path, self.root]) != self.root or not os.path.isfile(path):
+            raise QueryError('Unknown model {}'.format(name), status=404)
+        return path
+
+    async def get(self, name: str) -> WarmModel:
+        path = self.resolve(name)
+        mtime = os.path.getmtime(path)
+        warm = self._models.get(path)
+        if warm is not None and warm.mtime == mtime:
+            self._models.move_to_end(path)
+            return warm
+
+        key = (path, mtime)
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(path, mtime))
+            self._loading[key] = task
+            task.add_done_callback(lambda _: self._loading.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, path: str, mtime: float) -> WarmModel:
+        loop = asyncio.get_running_loop()
+        model = await loop.run_in_executor(self.executor, ifcopenshell.open, path)
+        warm = self._models[path] = WarmModel(path, mtime, model)
+        self._models.move_to_end(path)
+        while len(self._models) > self.max_models:
+            self._models.popitem(last=False)
+        return warm
+
+    def describe(self) -> list:
+        return [{'model': os.path.relpath(warm.path, self.root), 'schema': warm.model.schema}
+            for warm in self._models.values()]
+
+
+class LatencyStats:
+    """Request count, coalesced count & latency percentiles per endpoint"""
+
+    def __init__(self, samples: int = LATENCY_SAMPLES):
+        self.latencies = defaultdict(lambda: deque(maxlen=samples))
+        self.requests = defaultdict(int)
+        self.coalesced = defaultdict(int)
+
+    def record(self, endpoint: str, seconds: float) -> None:
+        self.requests[endpoint] += 1
+        self.latencies[endpoint].append(seconds)
+
+    def summary(self) -> dict:
+        summary = {}
+        for endpoint, samples in sorted(self.latencies.items()):
+            ordered = sorted(samples)
+            summary[endpoint] = {
+                'requests': self.requests[endpoint],
+                'coalesced': self.coalesced[endpoint],
+                'p50_ms': percentile(ordered, 50) * 1000,
+                'p90_ms': percentile(ordered, 90) * 1000,
+                'p99_ms': percentile(ordered, 99) * 1000,
+                'max_ms': ordered[-1] * 1000,
+                'mean_ms': statistics.fmean(ordered) * 1000,
+            }
+        return summary
+
+
+### Endpoints
+# Each endpoint runs in the worker pool as function(warm_model, params) -> JSON serialisable result
+ENDPOINTS = {}
+
+
+def endpoint(name):
+    def decorator(func):
+        ENDPOINTS[name] = func
+        return func
+    return decorator
+
+
+def _flag(params: dict, name: str) -> bool:
+    return params.get(name, '').lower() in ('1', 'true', 'yes')
+
+
+def _summary(element) -> dict:
+    if element is None:
+        return None
+    return {
+        'id': element.id(),
+        'type': element.is_a(),
+        'GlobalId': getattr(element, 'GlobalId', None),
+        'Name': getattr(element, 'Name', None),
+    }
+
+
+def _summaries(elements, params: dict) -> dict:
+    # Selector queries return sets, sort so 'limit' always picks the same elements
+    elements = sorted(elements, key=lambda element: element.id())
+    limit = params.get('limit')
+    if limit is not None:
+        error = QueryError("'limit' must be a non-negative integer, got {}".format(limit))
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise error
+        if limit < 0:
+            raise error
+    return {'count': len(elements), 'elements': [_summary(el) for el in elements[:limit]]}
+
+
+def _get_element(warm: WarmModel, params: dict):
+    """Element addressed by its STEP 'id' or its 'guid'"""
+    if 'id' not in params and 'guid' not in params:
+        raise QueryError("Missing 'id' or 'guid' parameter")
+    if 'id' in params:
+        try:
+            step_id = int(params['id'])
+        except ValueError:
+            raise QueryError("'id' must be an integer, got {}".format(params['id']))
+    try:
+        return warm.model.by_id(step_id) if 'id' in params else warm.model.by_guid(params['guid'])
+    except RuntimeError:
+        raise QueryError('Element {} not found'.format(params.get('id', params.get('guid'))), status=404)
+
+
+def _get_ifc_class(params: dict) -> str:
+    if 'ifc_class' not in params:
+        raise QueryError("Missing 'ifc_class' parameter")
+    return params['ifc_class']
+
+
+@endpoint('entity_types')
+def entity_types(warm, params):
+    """Same as misc.print_all_entity_types"""
+    return sorted(set(entity.is_a() for entity in warm.model))
+
+
+@endpoint('by_type')
+def by_type(warm, params):
+    """Same as misc.print_all_types_of_category, 'limit' caps the number of listed elements"""
+    try:
+        elements = warm.model.by_type(_get_ifc_class(params))
+    except RuntimeError:
+        raise QueryError('Unknown IFC class {}'.format(params['ifc_class']))
+    return _summaries(elements, params)
+
+
+@endpoint('type')
+def element_type(warm, params):
+    """Same as misc.print_type_of_element"""
+    return _summary(ifcopenshell.util.element.get_type(_get_element(warm, params)))
+
+
+@endpoint('psets')
+def psets(warm, params):
+    """Same as misc.print_properties_of_element, with optional 'psets_only' / 'qtos_only' flags"""
+    return ifcopenshell.util.element.get_psets(_get_element(warm, params),
+        psets_only=_flag(params, 'psets_only'), qtos_only=_flag(params, 'qtos_only'))
+
+
+@endpoint('container')
+def container(warm, params):
+    """Same as misc.find_spatial_container_of_element"""
+    return _summary(ifcopenshell.util.element.get_container(_get_element(warm, params)))
+
+
+@endpoint('decomposition')
+def decomposition(warm, params):
+    """Same as misc.find_all_elements_in_container"""
+    return _summaries(ifcopenshell.util.element.get_decomposition(_get_element(warm, params)), params)
+
+
+@endpoint('placement')
+def placement(warm, params):
+    """Same as misc.print_xyz_coordinates_of_element, returns the 4x4 matrix & its XYZ column"""
+    element = _get_element(warm, params)
+    if not getattr(element, 'ObjectPlacement', None):
+        raise QueryError('Element {} has no placement'.format(element.id()))
+    matrix = ifcopenshell.util.placement.get_local_placement(element.ObjectPlacement)
+    return {'matrix': matrix.tolist(), 'xyz': matrix[:,3][:3].tolist()}
+
+
+@endpoint('classification')
+def classification(warm, params):
+    """Same as misc.print_element_classification"""
+    references = []
+    for reference in ifcopenshell.util.classification.get_references(_get_element(warm, params)):
+        system = ifcopenshell.util.classification.get_classification(reference)
+        references.append({'reference': reference[1], 'system': system.Name if system else None})
+    return references
+
+
+@endpoint('systems')
+def systems(warm, params):
+    """Same as misc.print_element_distribution_system, answered from the model's SystemGraph"""
+    return [_summary(system) for system in warm.graph.get_element_systems(_get_element(warm, params))]
+
+
+@endpoint('select')
+def select(warm, params):
+    """Same as selector_syntax.print_concrete_elements_of_categories, for any selector 'query'"""
+    if 'query' not in params:
+        raise QueryError("Missing 'query' parameter")
+    return _summaries(ifcopenshell.util.selector.filter_elements(warm.model, params['query']), params)
+
+
+@endpoint('value')
+def value(warm, params):
+    """Same as selector_syntax.print_name_attribute_of_entity, for any selector 'query' e.g. type.Name"""
+    if 'query' not in params:
+        raise QueryError("Missing 'query' parameter")
+    return ifcopenshell.util.selector.get_element_value(_get_element(warm, params), params['query'])
+
+
+async def _read_headers(reader) -> dict:
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            return headers
+        key, _, header_value = line.decode('latin-1').partition(':')
+        headers[key.strip().lower()] = header_value.strip()
+
+
+def _content_length(headers: dict):
+    """Length of the request body, None for bodies the server cannot skip (chunked or malformed)"""
+    if 'transfer-encoding' in headers:
+        return None
+    try:
+        length = int(headers.get('content-length', '0'))
+    except ValueError:
+        return None
+    return length if length >= 0 else None
+
+
+async def _respond(writer, status: int, body, keep_alive: bool) -> None:
+    payload = json.dumps(body, default=str).encode()
+    writer.write('HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\nConnection: {}\r\n\r\n'.format(
+        status, HTTP_REASONS[status], len(payload), 'keep-alive' if keep_alive else 'close').encode('latin-1'))
+    writer.write(payload)
+    await writer.drain()
+
+
+class QueryServer:
+    """
+    Local query service keeping parsed models warm between requests.
+    Queries run in a worker pool so the event loop never blocks on ifcopenshell,
+    and identical requests in flight at the same time are answered by a single query.
+
+    Usage:
+        GET /by_type?model=AC20-FZK-Haus.ifc&ifc_class=IfcWall&limit=10
+        GET /psets?model=AC20-FZK-Haus.ifc&id=15042&psets_only=1
+        GET /select?model=AC20-FZK-Haus.ifc&query=IfcDoor, material=Holz
+        GET /stats
+    """
+
+    def __init__(self, root: str, max_models: int = 4, workers: int = None):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ifc-query')
+        self.models = ModelCache(root, max_models, self.executor)
+        self.stats = LatencyStats()
+        self._in_flight = {}
+
+    async def query(self, name: str, params: dict):
+        key = (name, tuple(sorted(params.items())))
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run(name, params))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.stats.coalesced[name] += 1
+        # A client disconnecting must not cancel the query for the others waiting on it
+        return await asyncio.shield(task)
+
+    async def _run(self, name: str, params: dict):
+        warm = await self.models.get(params.get('model'))
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, ENDPOINTS[name], warm, params)
+
+    async def dispatch(self, method: str, target: str):
+        """Return (status, body) for a single request"""
+        if method != 'GET':
+            return 405, {'error': 'Only GET requests are supported'}
+        url = urlsplit(target)
+        name = url.path.strip('/')
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        if name == 'stats':
+            return 200, self.stats.summary()
+        if name == 'models':
+            return 200, self.models.describe()
+        if name not in ENDPOINTS:
+            return 404, {'error': 'Unknown endpoint {}'.format(name), 'endpoints': sorted(ENDPOINTS)}
+
+        start = time.perf_counter()
+        try:
+            return 200, await self.query(name, params)
+        except QueryError as e:
+            return e.status, {'error': str(e)}
+        except Exception as e:
+            print('[-] {} {} failed: {!r}'.format(name, params, e))
+            return 500, {'error': repr(e)}
+        finally:
+            self.stats.record(name, time.perf_counter() - start)
+
+    async def handle_connection(self, reader, writer) -> None:
+        """Minimal HTTP/1.1 with keep-alive, enough for dashboards & the load test"""
+        try:
+            while True:
+                try:
+                    request_line = await reader.readline()
+                    if not request_line:
+                        break
+                    if not request_line.strip():
+                        # Stray line breaks between requests are allowed, see RFC 9112 section 2.2
+                        continue
+                    headers = await _read_headers(reader)
+                except ValueError:
+                    # readline raises ValueError for lines longer than the StreamReader limit (64 KiB)
+                    await _respond(writer, 400, {'error': 'Request line or header too long'}, keep_alive=False)
+                    break
+
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                # Request bodies are never used, but must be consumed to find the next request
+                content_length = _content_length(headers)
+                parts = request_line.decode('latin-1').split()
+                if content_length is None:
+                    status, body = 400, {'error': 'Unsupported request body'}
+                    keep_alive = False
+                elif len(parts) != 3:
+                    await reader.readexactly(content_length)
+                    status, body = 400, {'error': 'Malformed request line'}
+                    keep_alive = False
+                else:
+                    await reader.readexactly(content_length)
+                    status, body = await self.dispatch(parts[0], parts[1])
+
+                await _respond(writer, status, body, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8765, unix_path: str = None) -> None:
+        if unix_path:
+            server = await asyncio.start_unix_server(self.handle_connection, path=unix_path)
+            print('[+] Serving IFC queries on unix:{}'.format(unix_path))
+        else:
+            server = await asyncio.start_server(self.handle_connection, host=host, port=port)
+            print('[+] Serving IFC queries on http://{}:{}'.format(host, port))
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve misc.py & selector_syntax.py queries on warm IFC models')
+    parser.add_argument('--root', default=os.getcwd(), help='Directory the model paths are relative to')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help='Listen on a Unix socket instead of localhost TCP')
+    parser.add_argument('--max-models', type=int, default=4, help='Parsed models kept in memory')
+    parser.add_argument('--workers', type=int, default=None, help='Worker threads running the queries')
+    args = parser.parse_args()
+
+    server = QueryServer(args.root, max_models=args.max_models, workers=args.workers)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
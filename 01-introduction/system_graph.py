@@ -0,0 +1,196 @@
+import numpy
+
+# Groups that are IfcSystem subtypes but not distribution systems, skipped like ifcopenshell.util.system does
+NON_DISTRIBUTION_SYSTEMS = ('IfcStructuralAnalysisModel', 'IfcZone')
+
+
+def _by_type(ifc_model, ifc_class: str) -> list:
+    """by_type that returns nothing for classes missing from the model schema"""
+    try:
+        return ifc_model.by_type(ifc_class)
+    except RuntimeError:
+        return []
+
+
+def _csr(src, dst, node_count: int):
+    """Compressed sparse row arrays (indptr, indices) for the edges src[i] -> dst[i]"""
+    src = numpy.asarray(src, dtype=numpy.int64)
+    dst = numpy.asarray(dst, dtype=numpy.int64)
+    order = numpy.argsort(src, kind='stable')
+    indptr = numpy.zeros(node_count + 1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(src, minlength=node_count), out=indptr[1:])
+    return indptr, dst[order]
+
+
+def _neighbours(indptr, indices, nodes):
+    """All neighbours of `nodes` gathered in one go, without a Python loop per node"""
+    starts = indptr[nodes]
+    counts = indptr[nodes + 1] - starts
+    total = counts.sum()
+    if total == 0:
+        return numpy.empty(0, dtype=numpy.int64)
+    # Offset of every gathered slot relative to the start of its own slice
+    offsets = numpy.arange(total) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+    return indices[numpy.repeat(starts, counts) + offsets]
+
+
+class SystemGraph:
+    """
+    Array backed connectivity graph of a distribution (MEP) network.
+    Built in one pass over the port nesting, IfcRelConnectsPorts & IfcRelAssignsToGroup
+    relationships, so system membership & flow traces do not need a util call per element.
+
+    Elements are numbered 0..n-1, and every relationship is stored as CSR arrays:
+    - downstream: owner of an IfcRelConnectsPorts RelatingPort -> owner of its RelatedPort,
+      the direction followed by ifcopenshell.util.system.get_connected_to (FlowDirection is not used)
+    - upstream: the same edges reversed, as ifcopenshell.util.system.get_connected_from
+    - neighbours: all port connections regardless of flow direction
+    - membership: element -> indices into `systems`
+
+    Usage:
+        graph = SystemGraph(model)
+        graph.get_element_systems(pipe)
+        graph.trace(terminal, direction='upstream')
+    """
+
+    def __init__(self, ifc_model):
+        self.ifc_model = ifc_model
+        self.elements = []
+        self.systems = []
+        self._index = {}
+        self._system_index = {}
+
+        port_owner = {}
+        # IFC4 nests ports under their element, IFC2X3 uses IfcRelConnectsPortToElement
+        for rel in _by_type(ifc_model, 'IfcRelNests'):
+            if rel.RelatingObject.is_a('IfcElement'):
+                for port in rel.RelatedObjects:
+                    if port.is_a('IfcPort'):
+                        port_owner[port.id()] = self._add_element(rel.RelatingObject)
+        for rel in _by_type(ifc_model, 'IfcRelConnectsPortToElement'):
+            port_owner[rel.RelatingPort.id()] = self._add_element(rel.RelatedElement)
+
+        src, dst = [], []
+        for rel in _by_type(ifc_model, 'IfcRelConnectsPorts'):
+            a = port_owner.get(rel.RelatingPort.id())
+            b = port_owner.get(rel.RelatedPort.id())
+            if a is None or b is None or a == b:
+                continue
+            src.append(a)
+            dst.append(b)
+
+        member, system = [], []
+        for rel in _by_type(ifc_model, 'IfcRelAssignsToGroup'):
+            group = rel.RelatingGroup
+            if not group.is_a('IfcSystem') or group.is_a() in NON_DISTRIBUTION_SYSTEMS:
+                continue
+            system_index = self._system_index.get(rel.RelatingGroup.id())
+            if system_index is None:
+                system_index = self._system_index[rel.RelatingGroup.id()] = len(self.systems)
+                self.systems.append(rel.RelatingGroup)
+            for element in rel.RelatedObjects:
+                member.append(self._add_element(element))
+                system.append(system_index)
+
+        n = len(self.elements)
+        self.element_ids = numpy.array([el.id() for el in self.elements], dtype=numpy.int64)
+        self.downstream_indptr, self.downstream_indices = _csr(src, dst, n)
+        self.upstream_indptr, self.upstream_indices = _csr(dst, src, n)
+        self.neighbour_indptr, self.neighbour_indices = _csr(src + dst, dst + src, n)
+        self.membership_indptr, self.membership_indices = _csr(member, system, n)
+
+    def _add_element(self, element) -> int:
+        index = self._index.get(element.id())
+        if index is None:
+            index = self._index[element.id()] = len(self.elements)
+            self.elements.append(element)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.elements)
+
+    def index_of(self, element):
+        """Node index of an element, None if it has no ports & belongs to no system"""
+        return self._index.get(element.id())
+
+    def get_element_systems(self, element) -> list:
+        """Same result as ifcopenshell.util.system.get_element_systems, from the prebuilt arrays"""
+        index = self.index_of(element)
+        if index is None:
+            return []
+        start, end = self.membership_indptr[index], self.membership_indptr[index + 1]
+        return [self.systems[i] for i in self.membership_indices[start:end]]
+
+    def system_membership(self) -> dict:
+        """Systems of every element in the graph, keyed by element"""
+        membership = {}
+        indptr, indices = self.membership_indptr, self.membership_indices.tolist()
+        for index, element in enumerate(self.elements):
+            membership[element] = [self.systems[i] for i in indices[indptr[index]:indptr[index + 1]]]
+        return membership
+
+    def system_elements(self) -> dict:
+        """Members of every system, keyed by system"""
+        members = {system: [] for system in self.systems}
+        for index, element in enumerate(self.elements):
+            start, end = self.membership_indptr[index], self.membership_indptr[index + 1]
+            for i in self.membership_indices[start:end]:
+                members[self.systems[i]].append(element)
+        return members
+
+    def component_labels(self):
+        """Connected component label per node index (the smallest node index in the component)"""
+        parent = list(range(len(self.elements)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        indptr = self.neighbour_indptr
+        for a, b in zip(numpy.repeat(numpy.arange(len(self.elements)), numpy.diff(indptr)).tolist(),
+                self.neighbour_indices.tolist()):
+            root_a, root_b = find(a), find(b)
+            if root_a != root_b:
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+        return numpy.array([find(i) for i in range(len(parent))], dtype=numpy.int64)
+
+    def connected_components(self) -> list:
+        """Elements grouped by physical port connectivity, largest network first"""
+        if not self.elements:
+            return []
+        labels = self.component_labels()
+        order = numpy.argsort(labels, kind='stable')
+        _, starts = numpy.unique(labels[order], return_index=True)
+        components = [[self.elements[i] for i in group] for group in numpy.split(order, starts[1:])]
+        return sorted(components, key=len, reverse=True)
+
+    def trace(self, start, direction: str = 'downstream', max_depth: int = None) -> list:
+        """
+        Breadth-first flow trace from one or more elements (e.g. a terminal or a pump).
+        direction - 'downstream' follows RelatingPort -> RelatedPort, 'upstream' the reverse,
+        'both' ignores the direction. Returns the reached elements in BFS order, starts included.
+        """
+        if direction == 'downstream':
+            indptr, indices = self.downstream_indptr, self.downstream_indices
+        elif direction == 'upstream':
+            indptr, indices = self.upstream_indptr, self.upstream_indices
+        elif direction == 'both':
+            indptr, indices = self.neighbour_indptr, self.neighbour_indices
+        else:
+            raise ValueError('Unknown direction. Expected: "downstream", "upstream" or "both"')
+
+        starts = start if isinstance(start, (list, tuple, set)) else [start]
+        frontier = numpy.unique([i for i in map(self.index_of, starts) if i is not None]).astype(numpy.int64)
+        visited = numpy.zeros(len(self.elements), dtype=bool)
+        visited[frontier] = True
+        reached = [frontier]
+        depth = 0
+        while frontier.size and (max_depth is None or depth < max_depth):
+            candidates = _neighbours(indptr, indices, frontier)
+            frontier = numpy.unique(candidates[~visited[candidates]])
+            visited[frontier] = True
+            reached.append(frontier)
+            depth += 1
+        return [self.elements[i] for i in numpy.concatenate(reached).tolist()]
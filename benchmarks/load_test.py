@@ -0,0 +1,140 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+
+from urllib.parse import quote
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '01-introduction'))
+from profiling import percentile
+
+
+class Client:
+    """Keep-alive HTTP client for the query server, one request at a time"""
+
+    def __init__(self, host: str, port: int, unix_path: str = None):
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.reader = self.writer = None
+
+    async def connect(self) -> None:
+        if self.unix_path:
+            self.reader, self.writer = await asyncio.open_unix_connection(self.unix_path)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def get(self, target: str):
+        self.writer.write('GET {} HTTP/1.1\r\nHost: {}\r\n\r\n'.format(target, self.host).encode('latin-1'))
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            if key.strip().lower() == 'content-length':
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+async def build_queries(client: Client, model: str) -> list:
+    """Mix of the small dashboard queries, using a few real element ids from the model"""
+    m = quote(model)
+    _, walls = await client.get('/by_type?model={}&ifc_class=IfcWall&limit=5'.format(m))
+    _, storeys = await client.get('/by_type?model={}&ifc_class=IfcBuildingStorey&limit=2'.format(m))
+    queries = [
+        '/by_type?model={}&ifc_class=IfcWall&limit=0'.format(m),
+        '/by_type?model={}&ifc_class=IfcDoor&limit=0'.format(m),
+        '/by_type?model={}&ifc_class=IfcWindow&limit=0'.format(m),
+        '/select?model={}&query={}'.format(m, quote('IfcDoor, IfcWindow, material=Holz')),
+    ]
+    for wall in walls['elements']:
+        queries += [
+            '/psets?model={}&id={}'.format(m, wall['id']),
+            '/container?model={}&id={}'.format(m, wall['id']),
+            '/placement?model={}&id={}'.format(m, wall['id']),
+            '/value?model={}&id={}&query=type.Name'.format(m, wall['id']),
+        ]
+    for storey in storeys['elements']:
+        queries.append('/decomposition?model={}&id={}&limit=0'.format(m, storey['id']))
+    return queries
+
+
+async def run_level(args, queries: list, concurrency: int) -> dict:
+    """`concurrency` clients share `args.requests` requests, cycling through the query mix"""
+    targets = itertools.cycle(queries)
+    remaining = [args.requests]
+    latencies = []
+    errors = [0]
+
+    async def worker():
+        client = Client(args.host, args.port, args.unix)
+        await client.connect()
+        try:
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                start = time.perf_counter()
+                status, _ = await client.get(next(targets))
+                latencies.append(time.perf_counter() - start)
+                if status != 200:
+                    errors[0] += 1
+        finally:
+            client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'clients': concurrency,
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput_rps': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+async def main(args) -> None:
+    client = Client(args.host, args.port, args.unix)
+    await client.connect()
+    # The first request also loads the model, keep it out of the measurements
+    queries = await build_queries(client, args.model)
+
+    print('{:>8}{:>10}{:>8}{:>12}{:>10}{:>10}'.format('clients', 'requests', 'errors', 'req/s', 'p50 ms', 'p99 ms'))
+    results = []
+    for concurrency in args.concurrency:
+        result = await run_level(args, queries, concurrency)
+        results.append(result)
+        print('{clients:>8}{requests:>10}{errors:>8}{throughput_rps:>12.1f}{p50_ms:>10.2f}{p99_ms:>10.2f}'.format(**result))
+
+    _, stats = await client.get('/stats')
+    client.close()
+    print('\nServer side latency per endpoint')
+    for name, endpoint_stats in stats.items():
+        print('{:<16} requests {requests:>7} coalesced {coalesced:>6} p50 {p50_ms:>8.2f} ms p99 {p99_ms:>8.2f} ms'.format(
+            name, **endpoint_stats))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'levels': results, 'server': stats}, f, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure query server throughput at increasing concurrency')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help='Connect to a Unix socket instead of localhost TCP')
+    parser.add_argument('--model', default='AC20-FZK-Haus.ifc', help='Model path relative to the server root')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 64])
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per concurrency level')
+    parser.add_argument('--output', help='Write the results as JSON')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,58 @@
+import argparse
+import ifcopenshell
+import ifcopenshell.api.root
+import ifcopenshell.guid
+import os
+
+
+def create_pipe_network(segment_count: int, output_path: str, network_size: int = 1000) -> str:
+    """
+    Create a synthetic IFC4 model of pipe networks, `network_size` segments each.
+    Every network is a binary tree of IfcPipeSegment joined through IfcDistributionPort
+    SOURCE -> SINK connections & assigned to its own IfcDistributionSystem.
+    The root segment of each network is tagged 'ROOT' so traces have a known terminal.
+    """
+    model = ifcopenshell.file(schema='IFC4')
+    ifcopenshell.api.root.create_entity(model, ifc_class='IfcProject', name='Pipe Networks')
+
+    def create(ifc_class, **attributes):
+        return model.create_entity(ifc_class, GlobalId=ifcopenshell.guid.new(), **attributes)
+
+    for network in range(0, segment_count, network_size):
+        size = min(network_size, segment_count - network)
+        segments = []
+        for i in range(size):
+            segment = create('IfcPipeSegment', Name='Pipe {}-{}'.format(network, i),
+                Tag='ROOT' if i == 0 else None)
+            ports = [create('IfcDistributionPort', FlowDirection='SINK')]
+            # Children of segment i in the tree are 2i+1 & 2i+2
+            ports += [create('IfcDistributionPort', FlowDirection='SOURCE')
+                for child in (2 * i + 1, 2 * i + 2) if child < size]
+            create('IfcRelNests', RelatingObject=segment, RelatedObjects=ports)
+            segments.append((segment, ports))
+            if i > 0:
+                parent_ports = segments[(i - 1) // 2][1]
+                create('IfcRelConnectsPorts', RelatingPort=parent_ports[2 - i % 2], RelatedPort=ports[0])
+        system = create('IfcDistributionSystem', Name='Network {}'.format(network),
+            PredefinedType='DOMESTICCOLDWATER')
+        create('IfcRelAssignsToGroup', RelatedObjects=[segment for segment, _ in segments], RelatingGroup=system)
+
+    model.write(output_path)
+    return output_path
+
+
+def get_pipe_network(segment_count: int, cache_dir: str) -> str:
+    """Path to a network of `segment_count` segments, generated once & cached next to the benchmarks"""
+    os.makedirs(cache_dir, exist_ok=True)
+    output_path = os.path.join(cache_dir, 'pipe-network-{}.ifc'.format(segment_count))
+    if not os.path.isfile(output_path):
+        create_pipe_network(segment_count, output_path)
+    return output_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic IFC pipe network')
+    parser.add_argument('segment_count', type=int)
+    parser.add_argument('output')
+    args = parser.parse_args()
+    create_pipe_network(args.segment_count, args.output)
@@ -0,0 +1,134 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from scenarios import BENCHMARKS_DIR, IFC_FILE_PATH, INTRO_DIR, SCENARIO_MODELS, SCENARIOS
+from scale_model import get_scaled_model
+
+sys.path.insert(0, INTRO_DIR)
+import ifcopenshell
+from profiling import Profiler, trace_meta, write_stacks
+
+BASELINE_PATH = os.path.join(BENCHMARKS_DIR, 'baseline.json')
+CACHE_DIR = os.path.join(BENCHMARKS_DIR, '.cache')
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, 'results')
+
+
+def run_scenario(profiler: Profiler, name: str, model, model_path: str, out_dir: str) -> float:
+    """Run a scenario once under `profiler`, return its wall time"""
+    with profiler.instrumented():
+        start = time.perf_counter()
+        # The scenarios come from scripts which print everything they find
+        with contextlib.redirect_stdout(io.StringIO()):
+            with profiler.profile(name):
+                SCENARIOS[name](model, model_path, out_dir)
+        return time.perf_counter() - start
+
+
+def run_scale(factor: int, names: list, repeat: int, out_dir: str) -> dict:
+    """
+    Run every scenario `repeat` times on the `factor`x model, return results keyed by scenario.
+    Timings come from untraced runs, memory from one extra run with tracemalloc on.
+    The collapsed stacks of all scenarios are written to results/stacks-<factor>x.folded
+    """
+    model_path = get_scaled_model(IFC_FILE_PATH, factor, CACHE_DIR)
+    models = {model_path: ifcopenshell.open(model_path)}
+    results = {}
+    stacks = {}
+
+    for name in names:
+        scenario_path = SCENARIO_MODELS[name](factor, CACHE_DIR) if name in SCENARIO_MODELS else model_path
+        if scenario_path not in models:
+            models[scenario_path] = ifcopenshell.open(scenario_path)
+        model = models[scenario_path]
+        profiler = Profiler(trace_memory=False)
+        runs = [run_scenario(profiler, name, model, scenario_path, out_dir) for _ in range(repeat)]
+        memory_profiler = Profiler(trace_memory=True)
+        run_scenario(memory_profiler, name, model, scenario_path, out_dir)
+
+        operations = profiler.summary()
+        for op_name, op in memory_profiler.summary().items():
+            if op_name in operations:
+                operations[op_name]['peak_python_kib'] = op['peak_python_kib']
+                operations[op_name]['rss_growth_kib'] = op['rss_growth_kib']
+        results[name] = {
+            'median_s': statistics.median(runs),
+            'min_s': min(runs),
+            'runs_s': runs,
+            'operations': operations,
+        }
+        stacks.update(profiler.stacks)
+        print('{:>5}x {:<60}{:>10.2f} ms'.format(factor, name, results[name]['median_s'] * 1000))
+
+    write_stacks(stacks, os.path.join(RESULTS_DIR, 'stacks-{}x.folded'.format(factor)))
+    return results
+
+
+def compare_with_baseline(current: dict, baseline: dict, tolerance: float, min_delta_s: float) -> list:
+    """Return a description of every scenario slower than the baseline by more than `tolerance`"""
+    regressions = []
+    for key, result in sorted(current.items()):
+        reference = baseline.get(key)
+        if reference is None:
+            print('[?] {} has no baseline'.format(key))
+            continue
+        delta = result['median_s'] - reference['median_s']
+        if result['median_s'] > reference['median_s'] * (1 + tolerance) and delta > min_delta_s:
+            regressions.append('{}: {:.2f} ms -> {:.2f} ms ({:+.0%})'.format(
+                key, reference['median_s'] * 1000, result['median_s'] * 1000, delta / reference['median_s']))
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the introduction scripts on AC20-FZK-Haus.ifc')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true',
+        help='Store the results of this run as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+        help='Allowed slowdown relative to the baseline, 0.25 = 25%%')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+        help='Ignore slowdowns smaller than this, timer noise dominates tiny scenarios')
+    args = parser.parse_args()
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    current = {}
+    with tempfile.TemporaryDirectory() as out_dir:
+        for factor in args.scales:
+            for name, result in run_scale(factor, args.scenarios, args.repeat, out_dir).items():
+                current['{}x/{}'.format(factor, name)] = result
+
+    trace = {
+        'meta': dict(trace_meta(), repeat=args.repeat),
+        'scenarios': current,
+    }
+    with open(os.path.join(RESULTS_DIR, 'trace.json'), 'w') as f:
+        json.dump(trace, f, indent=2)
+
+    if args.update_baseline or not os.path.isfile(args.baseline):
+        with open(args.baseline, 'w') as f:
+            json.dump(trace, f, indent=2)
+        print('[+] Baseline written to {}'.format(args.baseline))
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare_with_baseline(
+        current, baseline['scenarios'], args.tolerance, args.min_delta_ms / 1000)
+    for regression in regressions:
+        print('[-] Regression', regression)
+    if not regressions:
+        print('[+] No regressions against {}'.format(args.baseline))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
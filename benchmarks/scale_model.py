@@ -0,0 +1,44 @@
+import argparse
+import ifcopenshell
+import ifcopenshell.api.root
+import os
+
+
+def scale_model(source_path: str, factor: int, output_path: str) -> str:
+    """
+    Create a synthetic model with `factor` times as many building elements as the source.
+    Every IfcElement (except openings & other feature elements) is copied with
+    ifcopenshell.api.root.copy_class, which also copies its property sets,
+    type assignment & spatial container, so psets/container queries scale too.
+    """
+    model = ifcopenshell.open(source_path)
+    elements = [el for el in model.by_type('IfcElement') if not el.is_a('IfcFeatureElement')]
+    print('[+] Scaling {} elements of {} by {}x'.format(len(elements), source_path, factor))
+
+    for _ in range(factor - 1):
+        for element in elements:
+            ifcopenshell.api.root.copy_class(model, product=element)
+
+    model.write(output_path)
+    return output_path
+
+
+def get_scaled_model(source_path: str, factor: int, cache_dir: str) -> str:
+    """Path to the `factor`x model, generated once & cached next to the benchmarks"""
+    if factor == 1:
+        return source_path
+    os.makedirs(cache_dir, exist_ok=True)
+    name, ext = os.path.splitext(os.path.basename(source_path))
+    output_path = os.path.join(cache_dir, '{}-{}x{}'.format(name, factor, ext))
+    if not os.path.isfile(output_path) or os.path.getmtime(output_path) < os.path.getmtime(source_path):
+        scale_model(source_path, factor, output_path)
+    return output_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic scaled IFC model')
+    parser.add_argument('source')
+    parser.add_argument('factor', type=int)
+    parser.add_argument('output')
+    args = parser.parse_args()
+    scale_model(args.source, args.factor, args.output)
@@ -0,0 +1,210 @@
+import contextlib
+import io
+import ifcopenshell
+import ifcopenshell.api.project
+import ifcopenshell.util.element
+import ifcopenshell.util.placement
+import ifcopenshell.util.selector
+import ifcopenshell.util.system
+import os
+import sys
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+INTRO_DIR = os.path.join(os.path.dirname(BENCHMARKS_DIR), '01-introduction')
+IFC_FILE_PATH = os.path.join(INTRO_DIR, 'AC20-FZK-Haus.ifc')
+
+# The introduction scripts open AC20-FZK-Haus.ifc from the working directory on import
+sys.path.insert(0, INTRO_DIR)
+_cwd = os.getcwd()
+os.chdir(INTRO_DIR)
+with contextlib.redirect_stdout(io.StringIO()):
+    import create_geometry
+    import misc
+    import selector_syntax
+os.chdir(_cwd)
+
+from mep_model import get_pipe_network
+from check_system_graph import compare_with_util, util_reachable
+from system_graph import SystemGraph
+
+# name -> function(model, model_path, out_dir)
+SCENARIOS = {}
+# name -> function(factor, cache_dir) returning the model path, for scenarios not run on AC20-FZK-Haus.ifc
+SCENARIO_MODELS = {}
+
+
+def scenario(name, model_path=None):
+    def decorator(func):
+        SCENARIOS[name] = func
+        if model_path is not None:
+            SCENARIO_MODELS[name] = model_path
+        return func
+    return decorator
+
+
+# Pipe networks already checked against ifcopenshell.util.system in this run
+_verified_networks = set()
+
+
+def pipe_network_path(factor, cache_dir):
+    """
+    1000 pipe segments per scale step, so the 100x run covers 100k segments.
+    Each network is checked once, so the mep.graph scenarios cannot report a speedup for wrong answers
+    """
+    path = get_pipe_network(1000 * factor, cache_dir)
+    if path not in _verified_networks:
+        verify_system_graph(ifcopenshell.open(path))
+        _verified_networks.add(path)
+    return path
+
+
+def _pipe_roots(model) -> list:
+    return [segment for segment in model.by_type('IfcPipeSegment') if segment.Tag == 'ROOT']
+
+
+def verify_system_graph(model) -> None:
+    """Raise if SystemGraph disagrees with ifcopenshell.util.system on system membership or traces"""
+    differences = compare_with_util(model, model.by_type('IfcPipeSegment'), trace_starts=[_pipe_roots(model)])
+    if differences:
+        raise RuntimeError('SystemGraph differs from ifcopenshell.util.system: {}'.format('; '.join(differences[:5])))
+
+
+@scenario('open')
+def open_model(model, model_path, out_dir):
+    ifcopenshell.open(model_path)
+
+
+# Not benchmarked: misc.create_copy_of_element adds elements to the shared model, which would
+# skew every later scenario, and misc.create_simple_ifc_project writes into the working directory
+@scenario('misc.iterate_through_all_entities')
+def iterate_through_all_entities(model, model_path, out_dir):
+    misc.iterate_through_all_entities(model)
+
+
+@scenario('misc.print_all_entity_types')
+def all_entity_types(model, model_path, out_dir):
+    misc.print_all_entity_types(model)
+
+
+@scenario('misc.print_all_types_of_category')
+def all_types_of_category(model, model_path, out_dir):
+    misc.print_all_types_of_category(model, misc.IfcElementTypeEnum.WALL.value)
+
+
+@scenario('misc.print_all_instances_of_type')
+def all_instances_of_type(model, model_path, out_dir):
+    misc.print_all_instances_of_type(model, misc.IfcElementTypeEnum.WINDOW.value)
+
+
+@scenario('misc.print_type_of_element')
+def type_of_element(model, model_path, out_dir):
+    misc.print_type_of_element(model, misc.IfcElementEnum.SLAB.value)
+
+
+@scenario('misc.print_properties_of_element')
+def properties_of_element(model, model_path, out_dir):
+    misc.print_properties_of_element(model, misc.IfcElementEnum.WALL.value)
+
+
+@scenario('misc.find_spatial_container_of_element')
+def spatial_container_of_element(model, model_path, out_dir):
+    misc.find_spatial_container_of_element(model, misc.IfcElementEnum.WALL.value)
+
+
+@scenario('misc.find_all_elements_in_container')
+def all_elements_in_container(model, model_path, out_dir):
+    misc.find_all_elements_in_container(model, misc.IfcElementEnum.STOREY.value)
+
+
+@scenario('misc.print_xyz_coordinates_of_element')
+def xyz_coordinates_of_element(model, model_path, out_dir):
+    misc.print_xyz_coordinates_of_element(model, misc.IfcElementEnum.WALL.value)
+
+
+@scenario('misc.print_element_classification')
+def element_classification(model, model_path, out_dir):
+    misc.print_element_classification(model, misc.IfcElementEnum.DOOR.value)
+
+
+@scenario('misc.print_element_distribution_system', model_path=pipe_network_path)
+def element_distribution_system(model, model_path, out_dir):
+    misc.print_element_distribution_system(model)
+
+
+@scenario('misc.print_all_distribution_systems', model_path=pipe_network_path)
+def all_distribution_systems(model, model_path, out_dir):
+    misc.print_all_distribution_systems(model)
+
+
+@scenario('selector_syntax.print_concrete_elements_of_categories')
+def concrete_elements_of_categories(model, model_path, out_dir):
+    selector_syntax.print_concrete_elements_of_categories(
+        model, selector_syntax.IfcElementEnum.DOOR.value, selector_syntax.IfcElementEnum.WINDOW.value,
+        material='Holz')
+
+
+@scenario('selector_syntax.print_name_attribute_of_entity')
+def name_attribute_of_entity(model, model_path, out_dir):
+    selector_syntax.print_name_attribute_of_entity(model, selector_syntax.IfcElementEnum.SLAB.value)
+
+
+@scenario('create_geometry')
+def create_geometry_project(model, model_path, out_dir):
+    new_model = ifcopenshell.api.project.create_file()
+    create_geometry.set_project_units(ifc_file=new_model, unit_type='LENGTHUNIT', prefix='MILLI')
+    create_geometry.representation_context_example(new_model)
+    create_geometry.set_obj_placement(new_model, create_geometry.IfcElementEnum.WALL.value)
+    new_model.write(os.path.join(out_dir, 'create_geometry.ifc'))
+
+
+# The misc.py functions above only look at the first element of a class,
+# the sweeps below run the same hot paths over every element so they grow with the model
+@scenario('sweep.get_psets')
+def sweep_psets(model, model_path, out_dir):
+    for element in model.by_type('IfcElement'):
+        ifcopenshell.util.element.get_psets(element)
+
+
+@scenario('sweep.get_container')
+def sweep_container(model, model_path, out_dir):
+    for element in model.by_type('IfcElement'):
+        ifcopenshell.util.element.get_container(element)
+
+
+@scenario('sweep.get_local_placement')
+def sweep_local_placement(model, model_path, out_dir):
+    for element in model.by_type('IfcProduct'):
+        if element.ObjectPlacement:
+            ifcopenshell.util.placement.get_local_placement(element.ObjectPlacement)
+
+
+@scenario('sweep.filter_elements')
+def sweep_filter_elements(model, model_path, out_dir):
+    ifcopenshell.util.selector.filter_elements(model, 'IfcWall, IfcSlab, IfcDoor, IfcWindow')
+
+
+# System membership & flow traces, per-element util calls against the prebuilt SystemGraph
+@scenario('mep.util.get_element_systems', model_path=pipe_network_path)
+def util_element_systems(model, model_path, out_dir):
+    for segment in model.by_type('IfcPipeSegment'):
+        ifcopenshell.util.system.get_element_systems(segment)
+
+
+@scenario('mep.graph.system_membership', model_path=pipe_network_path)
+def graph_system_membership(model, model_path, out_dir):
+    SystemGraph(model).system_membership()
+
+
+@scenario('mep.util.trace', model_path=pipe_network_path)
+def util_trace(model, model_path, out_dir):
+    util_reachable(_pipe_roots(model))
+
+
+@scenario('mep.graph.trace', model_path=pipe_network_path)
+def graph_trace(model, model_path, out_dir):
+    SystemGraph(model).trace(_pipe_roots(model))
+
+
+@scenario('mep.graph.connected_components', model_path=pipe_network_path)
+def graph_connected_components(model, model_path, out_dir):
+    SystemGraph(model).connected_components()